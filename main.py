@@ -1,9 +1,10 @@
 # main.py
 
 from src.skill_generator import generate_skill_list, get_skill_set
-from src.graph_generator import generate_dependency_graph
+from src.graph_generator import build_graph, generate_dependency_graph
+from src.plan_cache import embed_instruction, lookup_plan, store_plan
 from src.task_allocator import get_executable_skills, solve_task_allocation
-import networkx as nx
+from collections import deque
 
 def main_planner(instruction, robots):
     """
@@ -11,33 +12,55 @@ def main_planner(instruction, robots):
     """
     print(f"## 1. Processing Instruction: '{instruction}'")
     
-    # --- Step 1: Skill List Generation ---
-    skill_set = get_skill_set()
-    skill_list = generate_skill_list(instruction, skill_set)
-    if not skill_list:
-        print("Could not generate a skill list. Aborting.")
-        return
-    print("\n--- Generated Skill List ---")
-    for i, skill in enumerate(skill_list, 1):
-        print(f"{i}. {skill}")
+    # --- Plan Cache Lookup ---
+    # Similar instructions reuse a stored skill list and graph, skipping Steps 1 and 2
+    try:
+        instruction_embedding = embed_instruction(instruction)
+        cached_plan = lookup_plan(instruction, instruction_embedding)
+    except Exception as e:
+        print(f"Warning: Plan cache unavailable: {e}")
+        instruction_embedding, cached_plan = None, None
+
+    if cached_plan is not None:
+        skill_list, edges = cached_plan
+        print("\n--- Reusing Cached Plan ---")
+        for i, skill in enumerate(skill_list, 1):
+            print(f"{i}. {skill}")
+        graph = build_graph(skill_list, edges)
+        print("Dependencies (Edges):", graph.edges())
+    else:
+        # --- Step 1: Skill List Generation ---
+        skill_set = get_skill_set()
+        skill_list = generate_skill_list(instruction, skill_set)
+        if not skill_list:
+            print("Could not generate a skill list. Aborting.")
+            return
+        print("\n--- Generated Skill List ---")
+        for i, skill in enumerate(skill_list, 1):
+            print(f"{i}. {skill}")
+
+        # --- Step 2: Dependency Graph Generation ---
+        print("\n## 2. Generating Dependency Graph")
+        graph = generate_dependency_graph(skill_list)
+        if not graph.nodes:
+            print("Could not generate a dependency graph. Aborting.")
+            return
+        print("Dependencies (Edges):", graph.edges())
 
-    # --- Step 2: Dependency Graph Generation ---
-    print("\n## 2. Generating Dependency Graph")
-    graph = generate_dependency_graph(skill_list)
-    if not graph.nodes():
-        print("Could not generate a dependency graph. Aborting.")
-        return
-    print("Dependencies (Edges):", graph.edges())
-    
     # --- Step 3: Task Allocation and Execution Simulation ---
     print("\n## 3. Simulating Task Allocation and Execution")
+    # Track remaining predecessors per skill (Kahn's algorithm) so each step only
+    # touches the successors of completed skills instead of rescanning the graph
+    indeg = {n: graph.pred_count(n) for n in graph.nodes}
+    ready = deque(get_executable_skills(graph))
+    remaining = len(indeg)
     step_counter = 0
-    while graph.number_of_nodes() > 0:
+    while remaining > 0:
         step_counter += 1
         print(f"\n--- Step {step_counter} ---")
         
         # Get skills that can be executed now
-        executable_skills = get_executable_skills(graph)
+        executable_skills = list(ready)
         print("Executable Skills:", executable_skills)
         
         if not executable_skills:
@@ -54,12 +77,24 @@ def main_planner(instruction, robots):
             print("No tasks assigned in this step. Waiting...")
             continue
             
-        graph.remove_nodes_from(completed_tasks)
+        # Unassigned skills stay ready; successors whose last predecessor finished become ready
+        completed = set(completed_tasks)
+        ready = deque(n for n in ready if n not in completed)
+        for task in completed_tasks:
+            for succ in graph.successors(task):
+                indeg[succ] -= 1
+                if indeg[succ] == 0:
+                    ready.append(succ)
+        remaining -= len(completed_tasks)
         print("Completed Tasks:", completed_tasks)
-        print("Remaining Tasks:", len(graph.nodes()))
+        print("Remaining Tasks:", remaining)
         
     print("\n## 4. Planning Complete!")
 
+    # Only cache plans that executed to completion
+    if cached_plan is None and instruction_embedding is not None and remaining == 0:
+        store_plan(instruction, instruction_embedding, skill_list, graph.edges())
+
 
 if __name__ == '__main__':
     # Define our simulated robots
@@ -0,0 +1,68 @@
+# src/dag.py
+
+from collections import defaultdict, deque
+
+class DAG:
+    """
+    Minimal directed graph for skill dependencies.
+    Covers the few operations the planner needs without importing networkx.
+    """
+
+    def __init__(self):
+        self.succ = defaultdict(set)
+        self.pred = defaultdict(set)
+        # A dict is used as an insertion-ordered set so skills keep their plan order
+        self.nodes = {}
+
+    def add_nodes_from(self, nodes):
+        for node in nodes:
+            self.nodes[node] = None
+
+    def add_edges_from(self, edges):
+        for u, v in edges:
+            self.nodes[u] = None
+            self.nodes[v] = None
+            self.succ[u].add(v)
+            self.pred[v].add(u)
+
+    def edges(self):
+        """Returns the (predecessor, successor) pairs in node order."""
+        return [(u, v) for u in self.nodes for v in self.succ[u]]
+
+    def pred_count(self, node):
+        return len(self.pred[node])
+
+    def successors(self, node):
+        return self.succ[node]
+
+    def has_path(self, source, target):
+        """Checks whether target is reachable from source (depth-first search)."""
+        stack = [source]
+        seen = {source}
+        while stack:
+            u = stack.pop()
+            if u == target:
+                return True
+            for v in self.succ[u]:
+                if v not in seen:
+                    seen.add(v)
+                    stack.append(v)
+        return False
+
+    def in_degree_zero(self):
+        """Returns the nodes that have no remaining predecessors."""
+        return [n for n in self.nodes if not self.pred[n]]
+
+    def is_dag(self):
+        """Checks for cycles with Kahn's algorithm."""
+        indeg = {n: len(self.pred[n]) for n in self.nodes}
+        ready = deque(n for n, d in indeg.items() if d == 0)
+        visited = 0
+        while ready:
+            u = ready.popleft()
+            visited += 1
+            for v in self.succ[u]:
+                indeg[v] -= 1
+                if indeg[v] == 0:
+                    ready.append(v)
+        return visited == len(self.nodes)
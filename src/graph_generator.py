@@ -3,49 +3,59 @@
 import google.generativeai as genai
 import os
 import re
-import networkx as nx
 from dotenv import load_dotenv
+from src.dag import DAG
+from src.llm_cache import (
+    get_cached_edges, get_cached_text, get_model, invalidate, store_edges, store_text,
+)
 
 # --- Configuration ---
 load_dotenv()
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
-def build_dependency_prompt(skill_list):
-    """Builds a prompt to ask Gemini for skill dependencies."""
+MODEL_NAME = 'gemini-1.5-flash-latest'
 
-    formatted_skills = "\n".join([f"{i+1}. {skill}" for i, skill in enumerate(skill_list)])
+# Static part of the dependency prompt. It is sent as a system instruction;
+# only the skill list is sent as the per-request body.
+DEPENDENCY_SYSTEM_PROMPT = """
+You are a task planner for a multi-robot system. Your job is to identify precedence dependencies between a given list of skills. A dependency exists if one skill must be completed before another can begin.
 
-    prompt = f"""
-    You are a task planner for a multi-robot system. Your job is to identify precedence dependencies between a given list of skills. A dependency exists if one skill must be completed before another can begin.
+**Your Task:**
+1.  **Reasoning:** First, explain your reasoning step-by-step. For each skill, consider if it depends on any other skill in the list. For example, a stacking task `pick_and_place(A, B)` depends on the placement of B.
+2.  **Dependencies:** After your reasoning, provide the dependencies in a clear list format. Use the format "N -> M" to indicate that skill N must be completed before skill M. If there are no dependencies, state "None".
 
-    **Skill List:**
-    {formatted_skills}
+**Example Output:**
+
+**Reasoning:**
+- The skill 'pick_and_place(blue block, middle of the table)' has no dependencies.
+- The skill 'pick_and_place(red block, blue block)' requires the 'blue block' to be in its final position. Therefore, skill 2 depends on skill 1.
 
-    **Your Task:**
-    1.  **Reasoning:** First, explain your reasoning step-by-step. For each skill, consider if it depends on any other skill in the list. For example, a stacking task `pick_and_place(A, B)` depends on the placement of B.
-    2.  **Dependencies:** After your reasoning, provide the dependencies in a clear list format. Use the format "N -> M" to indicate that skill N must be completed before skill M. If there are no dependencies, state "None".
+**Dependencies:**
+1 -> 2
+"""
 
-    **Example Output:**
+# Regex to find lines like "1 -> 2" or "1->2"
+DEPENDENCY_RE = re.compile(r'(\d+)\s*->\s*(\d+)')
 
-    **Reasoning:**
-    - The skill 'pick_and_place(blue block, middle of the table)' has no dependencies.
-    - The skill 'pick_and_place(red block, blue block)' requires the 'blue block' to be in its final position. Therefore, skill 2 depends on skill 1.
+def build_dependency_prompt(skill_list):
+    """Builds the per-request part of the prompt asking Gemini for skill dependencies."""
+
+    formatted_skills = "\n".join([f"{i+1}. {skill}" for i, skill in enumerate(skill_list)])
 
-    **Dependencies:**
-    1 -> 2
+    prompt = f"""
+    **Skill List:**
+    {formatted_skills}
     """
     return prompt
 
 def parse_dependencies(response_text, skill_list):
     """Parses the LLM's text response to extract dependency edges."""
     edges = []
-    # Regex to find lines like "1 -> 2" or "1->2"
-    dependency_pattern = re.compile(r'(\d+)\s*->\s*(\d+)')
     
     # We only look for dependencies in the "Dependencies" section
     if "Dependencies:" in response_text:
-        dependency_section = response_text.split("Dependencies:")[1]
-        matches = dependency_pattern.findall(dependency_section)
+        dependency_section = response_text.rpartition("Dependencies:")[2]
+        matches = DEPENDENCY_RE.findall(dependency_section)
         for pred_idx, succ_idx in matches:
             # Convert from 1-based index to 0-based index
             u = skill_list[int(pred_idx) - 1]
@@ -53,40 +63,98 @@ def parse_dependencies(response_text, skill_list):
             edges.append((u, v))
     return edges
 
+def build_graph(skill_list, edges):
+    """Builds a dependency graph from a skill list and its precedence edges."""
+    graph = DAG()
+    graph.add_nodes_from(skill_list)
+    graph.add_edges_from(edges)
+    return graph
+
+def stream_dependencies(prompt, skill_list):
+    """
+    Streams the dependency response from Gemini and adds edges to a graph as
+    complete lines of the "Dependencies:" section arrive.
+    Returns the full response text, or None if an edge closes a cycle, in which
+    case the rest of the stream is abandoned.
+    """
+    response = get_model(MODEL_NAME, DEPENDENCY_SYSTEM_PROMPT).generate_content(prompt, stream=True)
+
+    graph = build_graph(skill_list, [])
+    response_text = ""
+    marker = -1   # Position of the "Dependencies:" section currently being parsed
+    parsed = 0    # Position up to which that section has been parsed
+
+    for chunk in response:
+        response_text += "".join(part.text for part in chunk.parts)
+
+        # parse_dependencies reads the last section, so restart if a new one begins
+        latest_marker = response_text.rfind("Dependencies:")
+        if latest_marker == -1:
+            continue
+        if latest_marker != marker:
+            marker = latest_marker
+            parsed = marker + len("Dependencies:")
+            graph = build_graph(skill_list, [])
+
+        # Only parse complete lines so a number split across chunks isn't misread
+        end = response_text.rfind("\n", parsed)
+        if end == -1:
+            continue
+        for match in DEPENDENCY_RE.finditer(response_text, parsed, end):
+            u = skill_list[int(match.group(1)) - 1]
+            v = skill_list[int(match.group(2)) - 1]
+            if graph.has_path(v, u):
+                # Stop consuming the stream; dropping the iterator closes the connection
+                return None
+            graph.add_edges_from([(u, v)])
+        parsed = end
+
+    return response_text
+
 def generate_dependency_graph(skill_list):
     """
     Generates a dependency graph from a skill list using an LLM.
     [cite_start]Includes a cycle check and regeneration loop as described in the paper. [cite: 160]
     """
     if not skill_list:
-        return nx.DiGraph()
+        return DAG()
+
+    # Reuse the edges of a previously accepted graph for the same skill list
+    cached_edges = get_cached_edges(MODEL_NAME, DEPENDENCY_SYSTEM_PROMPT, skill_list)
+    if cached_edges is not None:
+        return build_graph(skill_list, cached_edges)
 
     prompt = build_dependency_prompt(skill_list)
     
     for attempt in range(3): # Try up to 3 times to get an acyclic graph
         try:
-            model = genai.GenerativeModel('gemini-1.5-flash-latest')
-            response = model.generate_content(prompt)
-            
-            graph = nx.DiGraph()
-            graph.add_nodes_from(skill_list)
+            response_text = get_cached_text(MODEL_NAME, DEPENDENCY_SYSTEM_PROMPT, prompt)
+            if response_text is None:
+                response_text = stream_dependencies(prompt, skill_list)
+                if response_text is None:
+                    print(f"Warning: Cycle detected while streaming on attempt {attempt + 1}. Retrying...")
+                    continue
             
-            edges = parse_dependencies(response.text, skill_list)
-            graph.add_edges_from(edges)
+            edges = parse_dependencies(response_text, skill_list)
+            graph = build_graph(skill_list, edges)
             
-            if nx.is_directed_acyclic_graph(graph):
+            if graph.is_dag():
                 print("Successfully generated a Directed Acyclic Graph (DAG).")
+                store_text(MODEL_NAME, DEPENDENCY_SYSTEM_PROMPT, prompt, response_text)
+                store_edges(MODEL_NAME, DEPENDENCY_SYSTEM_PROMPT, skill_list, edges)
                 return graph
             else:
                 print(f"Warning: Cycle detected in graph on attempt {attempt + 1}. Retrying...")
+                # Drop the cyclic response so the retry asks the model again
+                invalidate(MODEL_NAME, DEPENDENCY_SYSTEM_PROMPT, prompt)
 
         except Exception as e:
             print(f"Error generating graph: {e}")
             # On error, return an empty graph or handle as needed
-            return nx.DiGraph()
+            return DAG()
             
     print("Error: Could not generate an acyclic graph after multiple attempts.")
-    return nx.DiGraph() # Return an empty or simple sequential graph as a fallback
+    return DAG() # Return an empty or simple sequential graph as a fallback
 
 # --- Example Usage ---
 # if __name__ == '__main__':
@@ -100,5 +168,5 @@ def generate_dependency_graph(skill_list):
     
 #     if dependency_graph:
 #         print("\n--- Graph Details ---")
-#         print("Nodes:", dependency_graph.nodes())
+#         print("Nodes:", list(dependency_graph.nodes))
 #         print("Edges:", dependency_graph.edges())
\ No newline at end of file
@@ -0,0 +1,143 @@
+# src/llm_cache.py
+
+import google.generativeai as genai
+import functools
+import hashlib
+import json
+import shelve
+
+# --- Configuration ---
+# Responses are stored on disk so reruns with the same prompt skip the API call
+CACHE_PATH = "./.gemini_cache"
+
+@functools.lru_cache(maxsize=None)
+def get_model(model_name, system_instruction):
+    """
+    Returns the shared model for a system instruction, created once per process
+    so its client keeps connections open. The static part of each prompt is sent
+    as the system instruction; callers only send the per-request body.
+    """
+    return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+def _cache_key(*parts):
+    """Builds a SHA-256 cache key from the given strings."""
+    return hashlib.sha256("".join(parts).encode()).hexdigest()
+
+def _response_key(model_name, system_instruction, prompt):
+    """Builds the cache key for a response from the model name, system instruction and prompt."""
+    return _cache_key(model_name, hashlib.sha256(system_instruction.encode()).hexdigest(), prompt)
+
+def cached_generate(model_name, system_instruction, prompt, **kwargs):
+    """
+    Returns the Gemini response text for a prompt, calling the API only on a cache miss.
+    Extra keyword arguments (e.g. generation_config) are passed to generate_content.
+    """
+    key = _response_key(model_name, system_instruction, prompt)
+    with shelve.open(CACHE_PATH) as cache:
+        if key in cache:
+            return cache[key]
+
+    model = get_model(model_name, system_instruction)
+    response = model.generate_content(prompt, **kwargs)
+    text = response.text
+
+    with shelve.open(CACHE_PATH) as cache:
+        cache[key] = text
+    return text
+
+async def cached_generate_async(model_name, system_instruction, prompt, semaphore=None, **kwargs):
+    """
+    Async version of cached_generate. If a semaphore is given, it bounds the
+    number of concurrent API calls (cache hits do not wait on it).
+    """
+    key = _response_key(model_name, system_instruction, prompt)
+    with shelve.open(CACHE_PATH) as cache:
+        if key in cache:
+            return cache[key]
+
+    model = get_model(model_name, system_instruction)
+    if semaphore is None:
+        response = await model.generate_content_async(prompt, **kwargs)
+    else:
+        async with semaphore:
+            response = await model.generate_content_async(prompt, **kwargs)
+    text = response.text
+
+    with shelve.open(CACHE_PATH) as cache:
+        cache[key] = text
+    return text
+
+def get_cached_text(model_name, system_instruction, prompt):
+    """Returns the cached response text for a prompt, or None on a miss."""
+    key = _response_key(model_name, system_instruction, prompt)
+    with shelve.open(CACHE_PATH) as cache:
+        return cache.get(key)
+
+def store_text(model_name, system_instruction, prompt, text):
+    """Stores a response that was generated outside cached_generate (e.g. streamed)."""
+    key = _response_key(model_name, system_instruction, prompt)
+    with shelve.open(CACHE_PATH) as cache:
+        cache[key] = text
+
+def invalidate(model_name, system_instruction, prompt):
+    """Removes a cached response, e.g. when it was rejected and should be regenerated."""
+    key = _response_key(model_name, system_instruction, prompt)
+    with shelve.open(CACHE_PATH) as cache:
+        if key in cache:
+            del cache[key]
+
+def _edges_key(model_name, system_instruction, skill_list):
+    """Builds the cache key for parsed dependency edges."""
+    return _cache_key(
+        "edges", model_name, hashlib.sha256(system_instruction.encode()).hexdigest(), repr(tuple(skill_list))
+    )
+
+def get_cached_edges(model_name, system_instruction, skill_list):
+    """Returns the cached dependency edges for a skill list, or None on a miss."""
+    key = _edges_key(model_name, system_instruction, skill_list)
+    with shelve.open(CACHE_PATH) as cache:
+        return cache.get(key)
+
+def store_edges(model_name, system_instruction, skill_list, edges):
+    """Stores the parsed dependency edges for a skill list."""
+    key = _edges_key(model_name, system_instruction, skill_list)
+    with shelve.open(CACHE_PATH) as cache:
+        cache[key] = list(edges)
+
+def _embedding_key(model_name, content):
+    """Builds the cache key for an embedding of a text or list of texts."""
+    return _cache_key("embedding", model_name, json.dumps(content))
+
+def cached_embed(model_name, content):
+    """Returns the embedding(s) for a text or list of texts, calling the API only on a cache miss."""
+    key = _embedding_key(model_name, content)
+    with shelve.open(CACHE_PATH) as cache:
+        if key in cache:
+            return cache[key]
+
+    embedding = genai.embed_content(model=model_name, content=content)['embedding']
+
+    with shelve.open(CACHE_PATH) as cache:
+        cache[key] = embedding
+    return embedding
+
+async def cached_embed_async(model_name, content, semaphore=None):
+    """
+    Async version of cached_embed. If a semaphore is given, it bounds the
+    number of concurrent API calls (cache hits do not wait on it).
+    """
+    key = _embedding_key(model_name, content)
+    with shelve.open(CACHE_PATH) as cache:
+        if key in cache:
+            return cache[key]
+
+    if semaphore is None:
+        result = await genai.embed_content_async(model=model_name, content=content)
+    else:
+        async with semaphore:
+            result = await genai.embed_content_async(model=model_name, content=content)
+    embedding = result['embedding']
+
+    with shelve.open(CACHE_PATH) as cache:
+        cache[key] = embedding
+    return embedding
@@ -0,0 +1,81 @@
+# src/plan_cache.py
+
+import google.generativeai as genai
+import json
+import numpy as np
+import re
+import sqlite3
+from contextlib import closing
+from src.skills import LOCATIONS, OBJECTS
+
+# --- Configuration ---
+# Successful plans are stored with an embedding of their instruction so that
+# similar instructions can reuse them without calling the LLM again.
+PLAN_CACHE_PATH = "./.plan_cache.sqlite"
+EMBEDDING_MODEL = "models/text-embedding-004"
+SIMILARITY_THRESHOLD = 0.90
+
+# Words that name objects and places in the skill set (e.g. "red", "block", "corner")
+_OBJECT_WORDS = frozenset(word for name in OBJECTS + LOCATIONS for word in name.split()) - {"of", "the"}
+
+def _connect():
+    """Opens the plan cache database, creating the table if needed."""
+    conn = sqlite3.connect(PLAN_CACHE_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS plans ("
+        "id INTEGER PRIMARY KEY, mentions TEXT, embedding BLOB, skill_list TEXT, edges TEXT)"
+    )
+    return conn
+
+def object_mentions(instruction):
+    """
+    Returns the object and place words of an instruction, in order.
+    Embeddings barely distinguish "stack red on blue" from "stack blue on red",
+    so a cached plan is only reused when this sequence matches exactly.
+    """
+    words = re.findall(r"[a-z]+", instruction.lower())
+    return " ".join(word for word in words if word in _OBJECT_WORDS)
+
+def embed_instruction(instruction):
+    """Returns the unit-normalized embedding of an instruction as a float32 vector."""
+    result = genai.embed_content(model=EMBEDDING_MODEL, content=instruction)
+    embedding = np.asarray(result['embedding'], dtype=np.float32)
+    return embedding / np.linalg.norm(embedding)
+
+def lookup_plan(instruction, embedding):
+    """
+    Finds the stored plan whose instruction is most similar to the given embedding,
+    among plans that mention the same objects in the same order.
+    Returns (skill_list, edges) if the cosine similarity exceeds the threshold, otherwise None.
+    """
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            "SELECT embedding, skill_list, edges FROM plans WHERE mentions = ?",
+            (object_mentions(instruction),),
+        ).fetchall()
+    if not rows:
+        return None
+
+    # Stored embeddings are normalized, so a matmul gives the cosine similarities
+    stored = np.stack([np.frombuffer(row[0], dtype=np.float32) for row in rows])
+    similarities = stored @ embedding
+    best = int(np.argmax(similarities))
+    if similarities[best] <= SIMILARITY_THRESHOLD:
+        return None
+
+    skill_list = json.loads(rows[best][1])
+    edges = [tuple(edge) for edge in json.loads(rows[best][2])]
+    return skill_list, edges
+
+def store_plan(instruction, embedding, skill_list, edges):
+    """Stores a successful plan under the embedding and object mentions of its instruction."""
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "INSERT INTO plans (mentions, embedding, skill_list, edges) VALUES (?, ?, ?, ?)",
+            (
+                object_mentions(instruction),
+                embedding.astype(np.float32).tobytes(),
+                json.dumps(list(skill_list)),
+                json.dumps(list(edges)),
+            ),
+        )
@@ -1,53 +1,75 @@
 # src/skill_generator.py
 
 import google.generativeai as genai
+import asyncio
+import functools
+import json
+import numpy as np
 import os
 import re
+import tempfile
+import time
 from dotenv import load_dotenv
+from src.llm_cache import cached_embed, cached_embed_async, cached_generate, cached_generate_async, invalidate
+from src.plan_cache import EMBEDDING_MODEL
+from src.skills import SKILL_SET
 
 # --- Configuration ---
 # Load environment variables from .env file
 load_dotenv()
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
-# --- Skill and Prompt Definitions ---
-# This part remains the same
-OBJECTS = ["red block", "blue block", "green block", "yellow block", "blue bowl"]
-LOCATIONS = ["middle of the table", "corner of the table", "red block", "blue block", "green block", "yellow block", "blue bowl"]
+# Upper bound on concurrent Gemini requests when planning several instructions at once
+MAX_CONCURRENT_REQUESTS = 8
+
+# Number of candidate skills sent to the model per step after embedding shortlisting
+SHORTLIST_SIZE = 8
+
+MODEL_NAME = 'gemini-1.5-flash-latest'
+
+# Static parts of the prompts. They are sent as system instructions; only the
+# instruction, history and candidates are sent as the per-request body.
+SKILL_CHOICE_SYSTEM_PROMPT = """
+You are a task planner for a multi-robot system. Your job is to decompose a natural language instruction into the most efficient sequence of executable skills.
+
+**Analysis:**
+Based on the instruction, determine the final goal for each object. From the list of candidate skills, choose the single most direct and logical next skill. Avoid any redundant or unnecessary intermediate steps. For example, to stack A on B, you only need to place B, then place A on B. Do not place A somewhere else first.
+
+**Your Choice:**
+Return only the full text of the single best skill from the candidate list.
+"""
+
+FULL_PLAN_SYSTEM_PROMPT = """
+You are a task planner for a multi-robot system. Your job is to decompose a natural language instruction into the most efficient sequence of executable skills.
+
+**Analysis:**
+Based on the instruction, determine the final goal for each object. Use only the most direct and logical skills. Avoid any redundant or unnecessary intermediate steps. For example, to stack A on B, you only need to place B, then place A on B. Do not place A somewhere else first.
+
+**Your Plan:**
+Return an ordered JSON list of skills from the candidate set that accomplishes the instruction, ending with 'done'. Copy the full text of each skill exactly.
+"""
 
+# --- Skill and Prompt Definitions ---
 def get_skill_set():
-    """Generates the predefined list of possible robot skills."""
-    skill_set = []
-    for obj in OBJECTS:
-        for loc in LOCATIONS:
-            if obj != loc:
-                skill_set.append(f"pick_and_place({obj}, {loc})")
-    skill_set.append("transport(table)")
-    skill_set.append("done")
-    return skill_set
+    """Returns the predefined tuple of possible robot skills."""
+    return SKILL_SET
 
 # In src/skill_generator.py
 
 def build_gemini_prompt(instruction, generated_skills, candidate_skills):
-    """Builds the prompt for Gemini to choose the best next skill."""
+    """Builds the per-request part of the prompt for Gemini to choose the best next skill."""
     
     prompt_template = """
-    You are a task planner for a multi-robot system. Your job is to decompose a natural language instruction into the most efficient sequence of executable skills.
-
     **Instruction:**
     "{instruction}"
 
     **Completed Skills:**
     {skill_history}
 
-    **Analysis:**
-    Based on the instruction, determine the final goal for each object. From the list of candidates below, choose the single most direct and logical next skill. Avoid any redundant or unnecessary intermediate steps. For example, to stack A on B, you only need to place B, then place A on B. Do not place A somewhere else first.
-
     **Candidate Skills:**
     {candidate_list}
 
-    **Your Choice:**
-    Return only the full text of the single best skill from the candidate list.
+    Choose the next skill.
     """
     
     skill_history = "\n".join([f"- {s}" for s in generated_skills]) if generated_skills else "No skills completed yet."
@@ -59,42 +81,253 @@ def build_gemini_prompt(instruction, generated_skills, candidate_skills):
         candidate_list=candidate_list
     )
 
-def choose_best_skill(instruction, generated_skills, skill_set):
+def _validate_skill(response_text, skill_set):
+    """
+    Returns the skill named in a response if it is in the skill set, otherwise None.
+    Callers that already hold the skills as a set should pass it for an O(1) lookup.
+    """
+    # Clean up the response to get only the skill text
+    chosen_skill = response_text.strip()
+    
+    # Validate that the model returned a valid skill
+    if chosen_skill in skill_set:
+        return chosen_skill
+    print(f"Warning: Model returned an invalid skill: '{chosen_skill}'")
+    return None
+
+@functools.lru_cache(maxsize=1)
+def _skill_embeddings(skill_set):
+    """
+    Embeds every skill once. Returns a dict mapping each skill to its row and
+    the (N, D) float32 matrix of unit-normalized skill embeddings, or None if
+    embedding failed (cached too, so a failure is only reported once per process).
+    """
+    try:
+        skill_emb = np.asarray(cached_embed(EMBEDDING_MODEL, list(skill_set)), dtype=np.float32)
+    except Exception as e:
+        print(f"Warning: Could not embed the skill set, shortlisting is disabled: {e}")
+        return None
+    skill_emb /= np.linalg.norm(skill_emb, axis=1, keepdims=True)
+    return {skill: i for i, skill in enumerate(skill_set)}, skill_emb
+
+def _shortlist_query(instruction, generated_skills):
+    """Builds the text that candidate skills are ranked against."""
+    return instruction + " | " + " ".join(generated_skills)
+
+def _rankable_skills(candidate_skills, k):
+    """
+    Returns the skill embeddings and the candidates that have one, or None when
+    there is nothing to rank (embedding failed or at most k such candidates).
+    """
+    embeddings = _skill_embeddings(get_skill_set())
+    if embeddings is None:
+        return None
+    index, skill_emb = embeddings
+    known = [s for s in candidate_skills if s in index and s != "done"]
+    if len(known) <= k:
+        return None
+    return index, skill_emb, known
+
+def _rank_skills(candidate_skills, rankable, query_embedding, k):
+    """
+    Keeps the k known candidates most similar to the query, in candidate order.
+    'done' and skills without an embedding are always kept.
+    """
+    index, skill_emb, known = rankable
+    q_emb = np.asarray(query_embedding, dtype=np.float32)
+    scores = skill_emb[[index[s] for s in known]] @ (q_emb / np.linalg.norm(q_emb))
+    top_k = {known[i] for i in np.argpartition(-scores, k)[:k].tolist()}
+    return [s for s in candidate_skills if s in top_k or s == "done" or s not in index]
+
+def shortlist_skills(instruction, generated_skills, candidate_skills, k=SHORTLIST_SIZE):
+    """
+    Ranks the candidate skills by embedding similarity to the instruction and
+    history, and returns the top k (in candidate order). 'done' and skills that
+    were not embedded are always kept. Falls back to all candidates if embedding fails.
+    """
+    rankable = _rankable_skills(candidate_skills, k)
+    if rankable is None:
+        return list(candidate_skills)
+
+    try:
+        query_embedding = cached_embed(EMBEDDING_MODEL, _shortlist_query(instruction, generated_skills))
+    except Exception as e:
+        print(f"Warning: Could not shortlist skills, sending all candidates: {e}")
+        return list(candidate_skills)
+    return _rank_skills(candidate_skills, rankable, query_embedding, k)
+
+async def shortlist_skills_async(instruction, generated_skills, candidate_skills, k=SHORTLIST_SIZE, semaphore=None):
+    """
+    Async version of shortlist_skills. The skill set should already be embedded
+    (see generate_skill_lists_async); the query embedding is bounded by the semaphore.
+    """
+    rankable = _rankable_skills(candidate_skills, k)
+    if rankable is None:
+        return list(candidate_skills)
+
+    try:
+        query_embedding = await cached_embed_async(
+            EMBEDDING_MODEL, _shortlist_query(instruction, generated_skills), semaphore
+        )
+    except Exception as e:
+        print(f"Warning: Could not shortlist skills, sending all candidates: {e}")
+        return list(candidate_skills)
+    return _rank_skills(candidate_skills, rankable, query_embedding, k)
+
+def choose_best_skill(instruction, generated_skills, skill_set, skill_lookup=None):
     """
     Uses the Gemini model to choose the most likely next skill from the skill set.
+    Only the skills most similar to the instruction are shown to the model.
+    `skill_lookup` is an optional set with the same skills, used to validate the choice.
     """
-    prompt = build_gemini_prompt(instruction, generated_skills, skill_set)
+    if skill_lookup is None:
+        skill_lookup = skill_set
+    candidate_skills = shortlist_skills(instruction, generated_skills, skill_set)
+    prompt = build_gemini_prompt(instruction, generated_skills, candidate_skills)
     
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash-latest')
-        response = model.generate_content(prompt)
-        
-        # Clean up the response to get only the skill text
-        chosen_skill = response.text.strip()
-        
-        # Validate that the model returned a valid skill
-        if chosen_skill in skill_set:
-            return chosen_skill
-        else:
-            print(f"Warning: Model returned an invalid skill: '{chosen_skill}'")
-            # Fallback: We could add more complex error handling here if needed
-            return None
+        response_text = cached_generate(MODEL_NAME, SKILL_CHOICE_SYSTEM_PROMPT, prompt)
+        chosen_skill = _validate_skill(response_text, skill_lookup)
+        if chosen_skill is None:
+            # Don't keep serving the rejected response on the next run
+            invalidate(MODEL_NAME, SKILL_CHOICE_SYSTEM_PROMPT, prompt)
+        return chosen_skill
             
     except Exception as e:
         print(f"Error calling Gemini API: {e}")
         return None
 
+async def choose_best_skill_async(instruction, generated_skills, skill_set, skill_lookup=None, semaphore=None):
+    """Async version of choose_best_skill."""
+    if skill_lookup is None:
+        skill_lookup = skill_set
+    candidate_skills = await shortlist_skills_async(instruction, generated_skills, skill_set, semaphore=semaphore)
+    prompt = build_gemini_prompt(instruction, generated_skills, candidate_skills)
+
+    try:
+        response_text = await cached_generate_async(MODEL_NAME, SKILL_CHOICE_SYSTEM_PROMPT, prompt, semaphore)
+        chosen_skill = _validate_skill(response_text, skill_lookup)
+        if chosen_skill is None:
+            invalidate(MODEL_NAME, SKILL_CHOICE_SYSTEM_PROMPT, prompt)
+        return chosen_skill
+
+    except Exception as e:
+        print(f"Error calling Gemini API: {e}")
+        return None
+
+def build_full_plan_prompt(instruction, skill_set):
+    """Builds the per-request part of the prompt for Gemini to return the whole skill sequence."""
+
+    prompt_template = """
+    **Instruction:**
+    "{instruction}"
+
+    **Candidate Skills:**
+    {candidate_list}
+
+    Return the full plan.
+    """
+
+    candidate_list = "\n".join([f"- {s}" for s in skill_set])
+
+    return prompt_template.format(
+        instruction=instruction,
+        candidate_list=candidate_list
+    )
+
+def _validate_plan(response_text, skill_set):
+    """
+    Parses a JSON plan response and keeps only known skills, stopping at 'done'.
+    Returns the list of skills, or None if nothing usable was returned.
+    """
+    try:
+        plan = json.loads(response_text)
+    except json.JSONDecodeError:
+        print(f"Warning: Model returned a plan that is not valid JSON: '{response_text}'")
+        return None
+    if not isinstance(plan, list):
+        print(f"Warning: Model returned a plan that is not a list: {plan!r}")
+        return None
+
+    # Keep only known skills, stop at 'done' and drop repeats
+    skill_set_lookup = skill_set if isinstance(skill_set, (set, frozenset)) else set(skill_set)
+    skill_list = []
+    seen = set()
+    for skill in plan:
+        if skill == "done":
+            break
+        if isinstance(skill, str) and skill in skill_set_lookup and skill not in seen:
+            skill_list.append(skill)
+            seen.add(skill)
+        else:
+            print(f"Warning: Dropping invalid skill from plan: {skill!r}")
+
+    return skill_list or None
+
+def generate_full_plan(instruction, skill_set):
+    """
+    Asks Gemini for the complete skill sequence in a single call.
+    Returns the validated list of skills (without 'done'), or None if the response is unusable.
+    """
+    prompt = build_full_plan_prompt(instruction, skill_set)
+    generation_config = genai.GenerationConfig(response_mime_type="application/json")
+
+    try:
+        response_text = cached_generate(
+            MODEL_NAME, FULL_PLAN_SYSTEM_PROMPT, prompt, generation_config=generation_config
+        )
+        skill_list = _validate_plan(response_text, skill_set)
+    except Exception as e:
+        print(f"Error generating full plan: {e}")
+        return None
+
+    if skill_list is None:
+        invalidate(MODEL_NAME, FULL_PLAN_SYSTEM_PROMPT, prompt)
+    return skill_list
+
+async def generate_full_plan_async(instruction, skill_set, semaphore=None):
+    """Async version of generate_full_plan."""
+    prompt = build_full_plan_prompt(instruction, skill_set)
+    generation_config = genai.GenerationConfig(response_mime_type="application/json")
+
+    try:
+        response_text = await cached_generate_async(
+            MODEL_NAME, FULL_PLAN_SYSTEM_PROMPT, prompt, semaphore, generation_config=generation_config
+        )
+        skill_list = _validate_plan(response_text, skill_set)
+    except Exception as e:
+        print(f"Error generating full plan: {e}")
+        return None
+
+    if skill_list is None:
+        invalidate(MODEL_NAME, FULL_PLAN_SYSTEM_PROMPT, prompt)
+    return skill_list
+
 def generate_skill_list(instruction, skill_set):
+    """
+    Generates a list of skills with a single full-plan request to Gemini.
+    Falls back to choosing skills one at a time if the plan cannot be validated.
+    """
+    skill_list = generate_full_plan(instruction, skill_set)
+    if skill_list:
+        return skill_list
+
+    print("Warning: Full plan generation failed. Falling back to iterative skill selection.")
+    return generate_skill_list_iteratively(instruction, skill_set)
+
+def generate_skill_list_iteratively(instruction, skill_set):
     """
     Generates a list of skills by iteratively asking Gemini to choose the best next skill.
     """
     generated_skills = []
     
-    # Create a dynamic list of skills that can still be chosen
-    remaining_skills = skill_set.copy()
+    # Track the skills that can still be chosen as a set; the prompt lists them in skill-set order
+    remaining_skills = set(skill_set)
     
     while True:
-        best_skill = choose_best_skill(instruction, generated_skills, remaining_skills)
+        best_skill = choose_best_skill(
+            instruction, generated_skills, [s for s in skill_set if s in remaining_skills], remaining_skills
+        )
         
         if best_skill is None or best_skill == "done":
             break
@@ -102,11 +335,146 @@ def generate_skill_list(instruction, skill_set):
         generated_skills.append(best_skill)
         
         # A skill can't be performed twice (in most simple cases)
-        if best_skill in remaining_skills:
-            remaining_skills.remove(best_skill)
+        remaining_skills.discard(best_skill)
     
     return generated_skills
 
+async def generate_skill_list_async(instruction, skill_set, semaphore=None):
+    """Async version of generate_skill_list."""
+    skill_list = await generate_full_plan_async(instruction, skill_set, semaphore)
+    if skill_list:
+        return skill_list
+
+    print("Warning: Full plan generation failed. Falling back to iterative skill selection.")
+    return await generate_skill_list_iteratively_async(instruction, skill_set, semaphore)
+
+async def generate_skill_list_iteratively_async(instruction, skill_set, semaphore=None):
+    """Async version of generate_skill_list_iteratively."""
+    generated_skills = []
+    
+    # Track the skills that can still be chosen as a set; the prompt lists them in skill-set order
+    remaining_skills = set(skill_set)
+    
+    while True:
+        best_skill = await choose_best_skill_async(
+            instruction, generated_skills, [s for s in skill_set if s in remaining_skills],
+            remaining_skills, semaphore
+        )
+        
+        if best_skill is None or best_skill == "done":
+            break
+        
+        generated_skills.append(best_skill)
+        
+        # A skill can't be performed twice (in most simple cases)
+        remaining_skills.discard(best_skill)
+    
+    return generated_skills
+
+async def generate_skill_lists_async(instructions, skill_set, max_concurrency=MAX_CONCURRENT_REQUESTS):
+    """
+    Generates skill lists for several independent instructions concurrently.
+    At most `max_concurrency` Gemini requests are in flight at once.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    # Embed the skill set once up front so the concurrent tasks share it
+    await asyncio.to_thread(_skill_embeddings, get_skill_set())
+    return await asyncio.gather(
+        *(generate_skill_list_async(instruction, skill_set, semaphore) for instruction in instructions)
+    )
+
+def _submit_batch(client, prompts, system_instruction, poll_interval=10):
+    """
+    Submits prompts as one Gemini Batch Mode job and waits for it to finish.
+    Returns a dict mapping each request key ("request_<i>") to the response text.
+    Raises RuntimeError if the job does not succeed.
+    """
+    # A private temporary file keeps concurrent runs from overwriting each other's requests
+    with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+        for key, prompt in prompts.items():
+            request = {
+                "contents": [{"parts": [{"text": prompt}], "role": "user"}],
+                "system_instruction": {"parts": [{"text": system_instruction}]},
+            }
+            f.write(json.dumps({"key": key, "request": request}) + "\n")
+
+    try:
+        uploaded = client.files.upload(file=f.name, config={"mime_type": "jsonl"})
+    finally:
+        os.remove(f.name)
+
+    try:
+        job = client.batches.create(model=MODEL_NAME, src=uploaded.name)
+
+        # Poll until the job reaches a terminal state
+        while job.state.name not in ("JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED",
+                                     "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"):
+            time.sleep(poll_interval)
+            job = client.batches.get(name=job.name)
+    finally:
+        client.files.delete(name=uploaded.name)
+
+    if job.state.name != "JOB_STATE_SUCCEEDED":
+        raise RuntimeError(f"Batch job {job.name} ended in state {job.state.name}")
+
+    results = {}
+    content = client.files.download(file=job.dest.file_name).decode("utf-8")
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        try:
+            parts = result["response"]["candidates"][0]["content"]["parts"]
+            results[result["key"]] = "".join(part.get("text", "") for part in parts)
+        except (KeyError, IndexError):
+            print(f"Warning: Batch request {result.get('key')} returned no response")
+    return results
+
+def generate_skill_lists_batched(instructions, skill_set):
+    """
+    Generates skill lists for many instructions using Gemini's Batch Mode.
+    Each round submits one batch job containing the next-skill prompt for every
+    instruction that is still active, so N instructions with plans of length K
+    take K batch jobs instead of N*K sequential requests.
+    Returns one skill list per instruction, or None for an instruction whose
+    request got no response. Raises RuntimeError if a batch job fails.
+    """
+    from google import genai as genai_client  # Batch Mode is only exposed by the google-genai SDK
+
+    client = genai_client.Client(api_key=os.getenv("GEMINI_API_KEY"))
+
+    generated = [[] for _ in instructions]
+    remaining = [set(skill_set) for _ in instructions]
+    active = list(range(len(instructions)))
+
+    while active:
+        prompts = {
+            f"request_{i}": build_gemini_prompt(
+                instructions[i], generated[i], [s for s in skill_set if s in remaining[i]]
+            )
+            for i in active
+        }
+        results = _submit_batch(client, prompts, SKILL_CHOICE_SYSTEM_PROMPT)
+
+        still_active = []
+        for i in active:
+            if f"request_{i}" not in results:
+                # Mark the plan as failed rather than returning it truncated
+                generated[i] = None
+                continue
+            chosen_skill = results[f"request_{i}"].strip()
+            if chosen_skill not in remaining[i]:
+                print(f"Warning: Model returned an invalid skill: '{chosen_skill}'")
+                continue
+            if chosen_skill == "done":
+                continue
+            generated[i].append(chosen_skill)
+            remaining[i].discard(chosen_skill)
+            still_active.append(i)
+        active = still_active
+
+    return generated
+
 # --- Example Usage ---
 # if __name__ == '__main__':
 #     all_skills = get_skill_set()
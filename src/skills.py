@@ -0,0 +1,27 @@
+# src/skills.py
+
+# --- Skill Definitions ---
+# Kept free of API/SDK imports so the task allocator can use them without
+# configuring Gemini.
+OBJECTS = ["red block", "blue block", "green block", "yellow block", "blue bowl"]
+LOCATIONS = ["middle of the table", "corner of the table", "red block", "blue block", "green block", "yellow block", "blue bowl"]
+
+# Robot type each skill requires ('done' needs no robot)
+SKILL_TYPE_ARM = 0
+SKILL_TYPE_MOBILE = 1
+SKILL_TYPE_NONE = -1
+
+def _build_skill_types():
+    """Generates the predefined robot skills, each tagged with the robot type it requires."""
+    skill_types = {}
+    for obj in OBJECTS:
+        for loc in LOCATIONS:
+            if obj != loc:
+                skill_types[f"pick_and_place({obj}, {loc})"] = SKILL_TYPE_ARM
+    skill_types["transport(table)"] = SKILL_TYPE_MOBILE
+    skill_types["done"] = SKILL_TYPE_NONE
+    return skill_types
+
+# Tagged once here so the task allocator compares integers instead of searching skill strings
+SKILL_TYPES = _build_skill_types()
+SKILL_SET = tuple(SKILL_TYPES)